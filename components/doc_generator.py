@@ -1,23 +1,34 @@
 # components/doc_generator.py
 import io
+import os
+import functools
+import docx
 from docx import Document
 
+@functools.lru_cache(maxsize=1)
+def _default_template_bytes() -> bytes:
+    """Reads python-docx's default template once so it isn't reopened from disk for every document."""
+    template_path = os.path.join(os.path.dirname(docx.__file__), "templates", "default.docx")
+    with open(template_path, "rb") as f:
+        return f.read()
+
 class DocumentGenerator:
     """Generates a downloadable DOCX file from text."""
 
     def create_docx(self, content: str, title: str = "Generated Document") -> io.BytesIO:
         """Creates a DOCX file in memory."""
-        doc = Document()
-        
+        doc = Document(io.BytesIO(_default_template_bytes()))
+
         # Add a title to the document
         doc.add_heading(title, level=1)
-        
-        # Add the content as a paragraph
-        doc.add_paragraph(content)
-        
+
+        # Add each blank-line-separated block of the content as its own paragraph
+        for paragraph in content.split("\n\n"):
+            doc.add_paragraph(paragraph)
+
         # Save the document to an in-memory bytes buffer
         doc_buffer = io.BytesIO()
         doc.save(doc_buffer)
         doc_buffer.seek(0)
-        
-        return doc_buffer
\ No newline at end of file
+
+        return doc_buffer
@@ -1,7 +1,53 @@
 # components/doc_processor.py
+import io
+import hashlib
+import zipfile
+import threading
+from collections import OrderedDict
 import streamlit as st
 import PyPDF2
 import docx
+from docx.oxml.ns import qn
+from lxml import etree
+
+# PyMuPDF is much faster than PyPDF2, but it is AGPL-licensed, so keep PyPDF2 as a fallback
+try:
+    import pymupdf as fitz
+except ImportError:
+    # Older PyMuPDF releases only provide the fitz name
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+# Recently extracted texts, keyed by (SHA-256 of the file, MIME type), so re-uploads skip parsing
+TEXT_CACHE_SIZE = 16
+_text_cache = OrderedDict()
+_text_cache_lock = threading.Lock()
+
+# WordprocessingML tags for a paragraph, a run, and the run children that hold text
+_W_P = qn("w:p")
+_W_R = qn("w:r")
+_W_T = qn("w:t")
+_W_TAB = qn("w:tab")
+_W_BR = qn("w:br")
+_W_CR = qn("w:cr")
+_W_TYPE = qn("w:type")
+
+def _paragraph_text(paragraph) -> str:
+    """Joins a paragraph's text like python-docx does, turning tabs into \\t and line breaks into \\n."""
+    parts = []
+    # Only look inside runs, since w:tab also appears in paragraph properties as a tab stop
+    for run in paragraph.iter(_W_R):
+        for child in run:
+            if child.tag == _W_T:
+                parts.append(child.text or "")
+            elif child.tag == _W_TAB:
+                parts.append("\t")
+            # Page and column breaks have no text, only plain line breaks do
+            elif child.tag == _W_CR or (child.tag == _W_BR and child.get(_W_TYPE, "textWrapping") == "textWrapping"):
+                parts.append("\n")
+    return "".join(parts)
 
 class DocumentProcessor:
     """Handles extracting text from uploaded documents."""
@@ -9,17 +55,60 @@ class DocumentProcessor:
     def extract_text(self, uploaded_file) -> str:
         """Extracts text from a PDF or DOCX file."""
         try:
-            if uploaded_file.type == "application/pdf":
-                reader = PyPDF2.PdfReader(uploaded_file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text()
-                return text
-            elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                doc = docx.Document(uploaded_file)
-                return "\n".join([para.text for para in doc.paragraphs])
-            else:
-                return "Unsupported file type. Please upload a PDF or DOCX file."
+            # Read the upload into memory once so the parsers work on a plain bytes buffer.
+            # getvalue() also ignores the stream position left over from earlier reruns.
+            data = uploaded_file.getvalue()
+            cache_key = (hashlib.sha256(data).hexdigest(), uploaded_file.type)
+            with _text_cache_lock:
+                if cache_key in _text_cache:
+                    _text_cache.move_to_end(cache_key)
+                    return _text_cache[cache_key]
+
+            text = self._extract_from_bytes(data, uploaded_file.type)
+
+            with _text_cache_lock:
+                _text_cache[cache_key] = text
+                if len(_text_cache) > TEXT_CACHE_SIZE:
+                    _text_cache.popitem(last=False)
+            return text
         except Exception as e:
             st.error(f"Error reading document: {e}")
-            return ""
\ No newline at end of file
+            return ""
+
+    def _extract_from_bytes(self, data: bytes, file_type: str) -> str:
+        """Extracts text from the raw bytes of a PDF or DOCX file."""
+        if file_type == "application/pdf":
+            return "".join(self._iter_pdf_pages(data))
+        elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+            return self._extract_docx(data)
+        else:
+            return "Unsupported file type. Please upload a PDF or DOCX file."
+
+    def iter_pdf_pages(self, uploaded_file):
+        """Yields the text of each page of a PDF in order, so large PDFs can be processed page by page."""
+        return self._iter_pdf_pages(uploaded_file.getvalue())
+
+    def _iter_pdf_pages(self, data: bytes):
+        if fitz is not None:
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                for page in doc:
+                    yield page.get_text("text")
+        else:
+            reader = PyPDF2.PdfReader(io.BytesIO(data))
+            for page in reader.pages:
+                # extract_text() can return None for pages without a text layer
+                yield page.extract_text() or ""
+
+    def _extract_docx(self, data: bytes) -> str:
+        """Extracts DOCX text by streaming the document XML, falling back to python-docx."""
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive, archive.open("word/document.xml") as xml:
+                paragraphs = []
+                for _, paragraph in etree.iterparse(xml, tag=_W_P):
+                    paragraphs.append(_paragraph_text(paragraph))
+                    # Free each paragraph once read so memory stays flat on large documents
+                    paragraph.clear()
+                return "\n".join(paragraphs)
+        except (zipfile.BadZipFile, KeyError, etree.XMLSyntaxError):
+            doc = docx.Document(io.BytesIO(data))
+            return "\n".join([para.text for para in doc.paragraphs])
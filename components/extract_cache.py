@@ -0,0 +1,49 @@
+# components/extract_cache.py
+import os
+import json
+import struct
+import hashlib
+import tempfile
+
+class ExtractionCache:
+    """A simple on-disk cache for extracted information, stored as one JSON file per key."""
+
+    def __init__(self, cache_dir: str):
+        """Creates the cache directory if it doesn't exist yet."""
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Builds a SHA-256 key from the given strings, length-prefixing each so they can't run together."""
+        hasher = hashlib.sha256()
+        for part in parts:
+            data = part.encode("utf-8")
+            hasher.update(struct.pack(">Q", len(data)))
+            hasher.update(data)
+        return hasher.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """Returns the cached value for the key, or None if it isn't cached."""
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, value) -> None:
+        """Stores a value in the cache. A failed write is ignored, since it only costs a cache miss later."""
+        tmp_path = None
+        try:
+            # Write to a uniquely named temp file first, so a crash never leaves a half-written entry behind
+            # and threads storing the same key at once never share a file
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+                tmp_path = f.name
+                json.dump(value, f)
+            os.replace(tmp_path, self._path(key))
+        except (OSError, TypeError, ValueError):
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
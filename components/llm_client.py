@@ -1,13 +1,183 @@
 # components/llm_client.py
 import os
-import json
+import re
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_google_genai.chat_models import ChatGoogleGenerativeAIError # Import the error class
+from langchain_google_genai.chat_models import GoogleAPIError, GoogleRateLimitError
+from google.genai.errors import APIError
+from components.extract_cache import ExtractionCache
+from components.rate_limiter import RateLimiter
+
+# orjson parses much faster than the standard library, but fall back to json if it isn't installed
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
 
 # Load environment variables when this module is imported
 load_dotenv()
 
+MODEL_NAME = "gemini-2.5-flash-lite"
+# The extracted JSON is only a few hundred tokens, so cap extraction replies well above that
+EXTRACT_MAX_OUTPUT_TOKENS = 512
+# Bump this whenever the extraction prompt changes so stale cache entries are ignored
+EXTRACT_PROMPT_VERSION = "5"
+# Most prompts sent at once by the batch methods; each still waits for the rate limiter
+BATCH_MAX_CONCURRENCY = 8
+
+# The fields the extraction prompt asks for, with the description given to the model
+EXTRACT_FIELDS = {
+    "Full Name": "The person's complete name",
+    "Employee ID": "Any identification number mentioned",
+    "Department": 'The specific department or team the person works in (e.g., "Machine Learning", "Data Science", "Engineering")',
+    "Company": 'The organization or company name (e.g., "Radiant Technologies", "Google", "Microsoft")',
+    "Start Date": "When the person started working",
+    "Job Title": "The person's role or position",
+    "Manager Name": "The name of their manager or supervisor",
+    "Annual Salary": "The yearly salary amount",
+}
+
+# Labels that can't be mistaken for another field, e.g. "Employee ID" in "Employee ID: 1234"
+_FIELD_LABELS = {
+    "Employee ID": r"employee\s+(?:id|number)|staff\s+id",
+    "Annual Salary": r"(?:annual|yearly)\s+salary",
+    "Full Name": r"full\s+name|employee\s+name|name",
+    "Manager Name": r"manager(?:'s)?\s+name|manager|supervisor",
+    "Department": r"department|dept",
+    "Company": r"company(?:\s+name)?|organization|employer",
+    "Job Title": r"job\s+title|designation",
+    "Start Date": r"start\s+date|joining\s+date|hire\s+date",
+}
+
+# A label only counts at the start of a line or sentence, or after a comma or "and",
+# so "Company name: Acme" is never read as a Full Name
+_LABEL_START = r"(?:^|(?<=[.!?;,]\s)|(?<=\sand\s))"
+
+# Abbreviations whose full stop doesn't end a value, e.g. "Dr. Ahmed Raza" or "Jan. 5, 2024"
+_ABBREVIATIONS = ["Dr", "Mr", "Mrs", "Ms", "Prof", "Jr", "Sr", "St", "Jan", "Feb", "Mar", "Apr",
+                  "Jun", "Jul", "Aug", "Sep", "Sept", "Oct", "Nov", "Dec"]
+
+# A value ends at the next label, at punctuation that ends a sentence, or at the end of the line
+_ANY_LABEL = "|".join(_FIELD_LABELS.values())
+_NOT_ABBREVIATION = "".join(r"(?<!\b%s)" % a for a in _ABBREVIATIONS)
+_VALUE_END = (
+    rf"(?=\s*[,;]?\s*(?:and\s+)?(?:{_ANY_LABEL})\s*:"
+    rf"|{_NOT_ABBREVIATION}[.!?;](?:\s|$)"
+    r"|\s*$)"
+)
+
+def _labelled(field: str, value: str = r"(\S.*?)") -> re.Pattern:
+    """Matches "Label: value" for the field, anywhere a new sentence or clause could start."""
+    return re.compile(rf"{_LABEL_START}(?:{_FIELD_LABELS[field]})\s*:\s*{value}{_VALUE_END}", re.I | re.M)
+
+# Cheap patterns for inputs that label a field explicitly, e.g. "Employee ID: 1234. Department: Sales."
+_FIELD_REGEX = {
+    "Employee ID": _labelled("Employee ID", r"([A-Z0-9-]*\d[A-Z0-9-]*)"),
+    "Annual Salary": _labelled("Annual Salary", r"([$£€]?\s*\d[\d,]*(?:\.\d+)?\s*[kK]?)"),
+    "Full Name": _labelled("Full Name"),
+    "Manager Name": _labelled("Manager Name"),
+    "Department": _labelled("Department"),
+    "Company": _labelled("Company"),
+    "Job Title": _labelled("Job Title"),
+    "Start Date": _labelled("Start Date"),
+}
+
+# The extraction prompt is built once with every field listed; only the user input is filled in per call
+_EXTRACT_FIELD_LINES = "\n".join(f"- {field}: {description}" for field, description in EXTRACT_FIELDS.items())
+_EXTRACT_PROMPT = f"""
+You are a data extraction expert specializing in employee information. From the user's input below, extract key-value pairs for the following fields:
+
+{_EXTRACT_FIELD_LINES}
+
+IMPORTANT DISTINCTIONS:
+- Department refers to the functional area or team (e.g., "Machine Learning", "Marketing")
+- Company refers to the organization they work for (e.g., "Radiant Technologies")
+- If someone says "I am a [role] at [company]", the [company] is the Company, not the Department
+- If someone says "I work in the [department]", the [department] is the Department
+
+Return the result as a single JSON object. If a piece of information is not present, do not include it in the JSON. Do not add any text before or after the JSON.
+
+User Input:
+---
+{{user_input}}
+---
+"""
+
+# Shared by every LLMClient so the limit holds across Streamlit sessions
+_rate_limiter = RateLimiter(requests_per_minute=int(os.getenv("GEMINI_RPM", "60")))
+
+# Every error the API can raise. Server errors (5xx) and oversized prompts come from google-genai
+# rather than subclassing ChatGoogleGenerativeAIError, so both bases are needed.
+_API_ERRORS = (ChatGoogleGenerativeAIError, APIError)
+
+def _is_retryable_error(e: BaseException) -> bool:
+    """
+    Retries rate limits and server errors, which can pass on their own.
+    An exhausted daily quota, a bad key, a bad request or a missing model won't, so those fail at once.
+    """
+    if isinstance(e, GoogleRateLimitError):
+        # Both per-minute and per-day limits are 429s; only the daily one names its quota "...PerDay..."
+        return "PerDay" not in str(e)
+    return isinstance(e, GoogleAPIError)
+
+# Backs off and retries transient API errors, giving up after five attempts
+_retry_api_errors = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential(multiplier=1, min=4, max=60),
+    retry=retry_if_exception(_is_retryable_error),
+    reraise=True,
+)
+
+# Matches the outermost {...} block in a reply that has extra text around the JSON
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+def _extract_with_regex(user_input: str) -> dict:
+    """Finds the fields that the user stated explicitly, without calling the AI."""
+    found = {}
+    for field, pattern in _FIELD_REGEX.items():
+        match = pattern.search(user_input)
+        if match:
+            found[field] = match.group(1).strip()
+    return found
+
+def _build_extract_prompt(user_input: str) -> str:
+    """Fills the extraction prompt with the user's input."""
+    return _EXTRACT_PROMPT.format(user_input=user_input)
+
+def _parse_json(text: str) -> dict:
+    """Parses JSON from the model's reply, falling back to the first {...} block if needed."""
+    # Both orjson's and json's decode errors are ValueErrors
+    try:
+        return _json.loads(text)
+    except ValueError:
+        match = _JSON_RE.search(text)
+        if not match:
+            return {}
+        try:
+            return _json.loads(match.group(0))
+        except ValueError:
+            return {}
+
+@functools.lru_cache(maxsize=2)
+def _build_llm(model: str, api_key: str, response_mime_type: str = None, max_output_tokens: int = None) -> ChatGoogleGenerativeAI:
+    """Builds the chat model once so its connection and credentials are reused."""
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=0.1,
+        google_api_key=api_key,
+        response_mime_type=response_mime_type,
+        max_output_tokens=max_output_tokens,
+        # The SDK would otherwise retry up to 6 times on its own, skipping the rate limiter.
+        # 1 means a single attempt; retries are left to _retry_api_errors, which takes a slot each time.
+        max_retries=1,
+    )
+
 class LLMClient:
     """A client to handle interactions with the Google Gemini AI model."""
 
@@ -17,61 +187,184 @@ class LLMClient:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found in .env file.")
         # FIX: Explicitly pass the API key to the constructor
-        self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite", temperature=0.1, google_api_key=api_key)
+        self.llm = _build_llm(MODEL_NAME, api_key)
+        # Extraction gets its own model that is told to answer with short, plain JSON, without markdown fences.
+        # get_response keeps the default output length since answers can be long.
+        self.llm_extract = _build_llm(MODEL_NAME, api_key, "application/json", EXTRACT_MAX_OUTPUT_TOKENS)
+        # Caching of extraction results is opt-in via LLM_CACHE_DIR
+        cache_dir = os.getenv("LLM_CACHE_DIR")
+        self.cache = ExtractionCache(cache_dir) if cache_dir else None
+        self._limiter = _rate_limiter
 
     def get_response(self, prompt: str, is_document_blank: bool = True) -> str:
         """Sends a prompt to the AI and returns the text response."""
         try:
-            response = self.llm.invoke(prompt)
+            response = self._invoke_with_retry(prompt)
+            return response.content
+        except _API_ERRORS as e:
+            return self._response_error(e)
+
+    def stream_response(self, prompt: str):
+        """Sends a prompt to the AI and yields the text response piece by piece as it is generated."""
+        try:
+            for chunk in self._start_stream_with_retry(prompt):
+                yield chunk.content
+        except _API_ERRORS as e:
+            yield self._response_error(e)
+
+    async def aget_response(self, prompt: str, is_document_blank: bool = True) -> str:
+        """Async version of get_response, so several calls can wait on the AI at the same time."""
+        try:
+            response = await self._ainvoke_with_retry(prompt)
             return response.content
-        except ChatGoogleGenerativeAIError as e:
-            error_message = str(e)
-            if "RESOURCE_EXHAUSTED" in error_message or "quota" in error_message.lower():
-                return "Error: You have reached your free API quota for today. Please wait a while or upgrade your plan to continue."
-            else:
-                return f"An API error occurred: {e}"
+        except _API_ERRORS as e:
+            return self._response_error(e)
+
+    def get_responses(self, prompts: list[str]) -> list[str]:
+        """Sends several prompts to the AI at once and returns the text responses in order."""
+        # Each prompt goes through get_response, so it is rate limited and retried like a single call
+        with ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY) as executor:
+            return list(executor.map(self.get_response, prompts))
 
     def extract_info(self, user_input: str) -> dict:
         """
         Extracts key-value pairs from user input and returns them as a dictionary.
         """
+        result, cache_key, found, prompt = self._prepare_extraction(user_input)
+        if result is not None:
+            return result
         try:
-            prompt = f"""
-            You are a data extraction expert specializing in employee information. From the user's input below, extract key-value pairs for the following fields:
-            
-            - Full Name: The person's complete name
-            - Employee ID: Any identification number mentioned
-            - Department: The specific department or team the person works in (e.g., "Machine Learning", "Data Science", "Engineering")
-            - Company: The organization or company name (e.g., "Radiant Technologies", "Google", "Microsoft")
-            - Start Date: When the person started working
-            - Job Title: The person's role or position
-            - Manager Name: The name of their manager or supervisor
-            - Annual Salary: The yearly salary amount
-            
-            IMPORTANT DISTINCTIONS:
-            - Department refers to the functional area or team (e.g., "Machine Learning", "Marketing")
-            - Company refers to the organization they work for (e.g., "Radiant Technologies")
-            - If someone says "I am a [role] at [company]", the [company] is the Company, not the Department
-            - If someone says "I work in the [department]", the [department] is the Department
-            
-            Return the result as a single JSON object. If a piece of information is not present, do not include it in the JSON. Do not add any text before or after the JSON.
-
-            User Input:
-            ---
-            {user_input}
-            ---
-            """
-            response = self.llm.invoke(prompt)
-            # Clean the response and parse it as JSON
-            cleaned_response = response.content.strip().strip("```json").strip("```")
-            return json.loads(cleaned_response)
-        except ChatGoogleGenerativeAIError as e:
-            error_message = str(e)
-            if "RESOURCE_EXHAUSTED" in error_message or "quota" in error_message.lower():
-                # Return a special dictionary to indicate a quota error
-                return {"error": "RESOURCE_EXHAUSTED", "message": "You have reached your free API quota for today. Please wait a while or upgrade your plan to continue."}
-            else:
-                return {"error": "API_ERROR", "message": f"An API error occurred: {e}"}
-        except json.JSONDecodeError:
-            # If parsing fails, return an empty dictionary
-            return {}
\ No newline at end of file
+            response = self._invoke_with_retry(prompt, self.llm_extract)
+        except _API_ERRORS as e:
+            return self._extraction_error(e)
+        return self._parse_extraction(response.content, cache_key, found)
+
+    def quick_extract(self, user_input: str) -> dict:
+        """Returns the fields the user labelled explicitly, found without calling the AI."""
+        return _extract_with_regex(user_input)
+
+    async def aextract_info(self, user_input: str) -> dict:
+        """
+        Async version of extract_info, so several extractions can wait on the AI at the same time.
+        """
+        result, cache_key, found, prompt = self._prepare_extraction(user_input)
+        if result is not None:
+            return result
+        try:
+            response = await self._ainvoke_with_retry(prompt, self.llm_extract)
+        except _API_ERRORS as e:
+            return self._extraction_error(e)
+        return self._parse_extraction(response.content, cache_key, found)
+
+    async def aextract_info_many(self, inputs: list[str]) -> list[dict]:
+        """
+        Extracts key-value pairs from several user inputs, sending all uncached prompts at once.
+        """
+        results = [None] * len(inputs)
+        cache_keys = [None] * len(inputs)
+        found = [None] * len(inputs)
+        pending = []
+        prompts = []
+        for i, user_input in enumerate(inputs):
+            results[i], cache_keys[i], found[i], prompt = self._prepare_extraction(user_input)
+            if results[i] is None:
+                pending.append(i)
+                prompts.append(prompt)
+
+        if pending:
+            semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+            async def invoke(prompt: str):
+                # Each prompt is rate limited and retried like a single call
+                async with semaphore:
+                    return await self._ainvoke_with_retry(prompt, self.llm_extract)
+
+            responses = await asyncio.gather(*map(invoke, prompts), return_exceptions=True)
+            for i, response in zip(pending, responses):
+                if isinstance(response, _API_ERRORS):
+                    results[i] = self._extraction_error(response)
+                elif isinstance(response, Exception):
+                    raise response
+                else:
+                    results[i] = self._parse_extraction(response.content, cache_keys[i], found[i])
+        return results
+
+    @_retry_api_errors
+    def _invoke_with_retry(self, prompt: str, llm: ChatGoogleGenerativeAI = None):
+        """Sends a single prompt to the AI, backing off and retrying on transient API errors."""
+        llm = llm or self.llm
+        # Acquire on every attempt so retries also count against the rate limit
+        self._limiter.acquire()
+        return llm.invoke(prompt)
+
+    @_retry_api_errors
+    def _start_stream_with_retry(self, prompt: str):
+        """
+        Starts streaming a reply and waits for its first chunk, retrying transient API errors until it arrives.
+        Returns an iterator over all chunks. Once text has been shown, a failure can't be retried.
+        """
+        self._limiter.acquire()
+        stream = iter(self.llm.stream(prompt))
+        first = next(stream, None)
+        return stream if first is None else itertools.chain([first], stream)
+
+    @_retry_api_errors
+    async def _ainvoke_with_retry(self, prompt: str, llm: ChatGoogleGenerativeAI = None):
+        """Async version of _invoke_with_retry."""
+        llm = llm or self.llm
+        # The limiter blocks while it waits, so keep it off the event loop
+        await asyncio.to_thread(self._limiter.acquire)
+        return await llm.ainvoke(prompt)
+
+    def _prepare_extraction(self, user_input: str):
+        """
+        Does the work that comes before asking the AI to extract information.
+
+        Returns (result, cache_key, found, prompt). If result isn't None it is the final answer,
+        either from the cache or because every field was labelled explicitly, and the AI doesn't need to be called.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ExtractionCache.make_key(MODEL_NAME, EXTRACT_PROMPT_VERSION, user_input)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached, cache_key, None, None
+
+        # Skip the AI entirely if every field was labelled explicitly, otherwise ask it for all of them
+        found = _extract_with_regex(user_input)
+        if len(found) == len(EXTRACT_FIELDS):
+            return found, cache_key, found, None
+        return None, cache_key, found, _build_extract_prompt(user_input)
+
+    def _parse_extraction(self, content: str, cache_key: str = None, found: dict = None) -> dict:
+        """
+        Parses the model's JSON reply, filling in any fields it left out from those found by regex,
+        and caches the result if a cache key is given.
+        """
+        parsed = _parse_json(content.strip())
+        if not isinstance(parsed, dict) or not parsed:
+            # Don't fall back to the regex fields alone or cache the failure, so the user is asked to try again
+            return {}
+        # The model read the whole input, so its values win over the regex ones
+        extracted = {**(found or {}), **parsed}
+        if cache_key is not None:
+            self.cache.put(cache_key, extracted)
+        return extracted
+
+    @staticmethod
+    def _is_quota_error(e: Exception) -> bool:
+        error_message = str(e)
+        return "RESOURCE_EXHAUSTED" in error_message or "quota" in error_message.lower()
+
+    def _response_error(self, e: Exception) -> str:
+        """Turns an API error into the text shown in place of a response."""
+        if self._is_quota_error(e):
+            return "Error: You have reached your free API quota for today. Please wait a while or upgrade your plan to continue."
+        return f"An API error occurred: {e}"
+
+    def _extraction_error(self, e: Exception) -> dict:
+        """Turns an API error into the special dictionary returned by the extraction methods."""
+        if self._is_quota_error(e):
+            # Return a special dictionary to indicate a quota error
+            return {"error": "RESOURCE_EXHAUSTED", "message": "You have reached your free API quota for today. Please wait a while or upgrade your plan to continue."}
+        return {"error": "API_ERROR", "message": f"An API error occurred: {e}"}
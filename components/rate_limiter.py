@@ -0,0 +1,29 @@
+# components/rate_limiter.py
+import time
+import threading
+from collections import deque
+
+class RateLimiter:
+    """Limits how many requests are made per minute, blocking callers until a slot is free."""
+
+    def __init__(self, requests_per_minute: int = 60):
+        """Sets up the limiter for the given number of requests per minute."""
+        self.requests_per_minute = requests_per_minute
+        self.window = 60.0
+        self._timestamps = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Waits until another request can be made within the limit, then records it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                # Forget requests that have left the one-minute window
+                while self._timestamps and now - self._timestamps[0] >= self.window:
+                    self._timestamps.popleft()
+                if len(self._timestamps) < self.requests_per_minute:
+                    self._timestamps.append(now)
+                    return
+                wait_time = self.window - (now - self._timestamps[0])
+            # Sleep outside the lock so other threads can still check the window
+            time.sleep(wait_time)
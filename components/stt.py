@@ -1,36 +1,66 @@
 # components/stt.py
+import os
+import re
 import streamlit as st
 import speech_recognition as sr
 import io # Import the io library for in-memory operations
+import numpy as np
+
+# faster-whisper transcribes locally with no network round-trip; Google's web service is the fallback
+# when its model can't be loaded. It also bundles the Silero VAD model, which lets the Google fallback
+# skip silence instead of uploading it.
+from faster_whisper import WhisperModel, decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+# Words that suggest the speaker is using Urdu, matched in one case-insensitive pass
+URDU_MARKERS = ["urdu", "اردو", "میں", "آپ", "ہے"]
+_URDU_RE = re.compile("|".join(map(re.escape, URDU_MARKERS)), re.IGNORECASE)
+
+# Most speech sent to Google at once, so partial text can be shown early
+STREAM_CHUNK_SECONDS = 15
+
+# Whisper and Silero VAD both work on 16kHz mono audio
+SPEECH_SAMPLE_RATE = 16000
+
+# 0.5 speech probability threshold, ignoring speech under 250ms and pauses under 500ms
+VAD_PARAMETERS = {"threshold": 0.5, "min_speech_duration_ms": 250, "min_silence_duration_ms": 500}
 
 class STTHandler:
     """Handles Speech-to-Text conversion using an in-memory buffer."""
 
     def __init__(self):
-        """Initializes the recognizer."""
+        """Initializes the recognizer and loads the local Whisper model, if it is available."""
         self.recognizer = sr.Recognizer()
+        self.model = None
+        try:
+            # int8 quantization keeps the model fast and small on CPU
+            self.model = WhisperModel(os.getenv("WHISPER_MODEL", "small"), device="cpu", compute_type="int8")
+        except Exception as e:
+            # The model is downloaded on first use, which fails offline; Google still works then
+            st.warning(f"Could not load the Whisper model, using Google speech recognition instead. Error: {e}")
 
-    def transcribe(self, audio_bytes) -> tuple[str, str]:
-        """Converts audio bytes to text using an in-memory buffer."""
+    def transcribe(self, audio_bytes, on_partial=None) -> tuple[str, str]:
+        """
+        Converts audio bytes to text using an in-memory buffer.
+        If on_partial is given, it is called with the text so far each time more audio is transcribed.
+        """
         try:
-            # --- THE FIX: Use an in-memory buffer instead of a temp file ---
-            audio_buffer = io.BytesIO(audio_bytes)
-            
-            # Use the recognizer to read from the in-memory buffer
-            with sr.AudioFile(audio_buffer) as source:
-                audio_data = self.recognizer.record(source)
-                
-                # Use Google's free web service for transcription.
-                text = self.recognizer.recognize_google(audio_data)
-                
-                # No need to clean up a temp file anymore!
-                
-                # Detect language (basic implementation)
-                detected_lang = "en"  # Default to English
-                if any(word in text.lower() for word in ["urdu", "اردو", "میں", "آپ", "ہے"]):
-                    detected_lang = "ur"
-                
-                return text, detected_lang
+            text, language = "", None
+            for text, is_final, language in self.stream_transcribe(audio_bytes):
+                if on_partial is not None and not is_final:
+                    on_partial(text)
+
+            if not text:
+                raise sr.UnknownValueError()
+
+            # Trust Whisper when it detects English or Urdu. It often labels Urdu as Hindi, so any
+            # other language, or none at all, falls back to a basic keyword check
+            if language in ("en", "ur"):
+                detected_lang = language
+            else:
+                detected_lang = "ur" if _URDU_RE.search(text) else "en"  # Default to English
+
+            return text, detected_lang
 
         except sr.UnknownValueError:
             return "Sorry, I could not understand that.", "en"
@@ -39,4 +69,65 @@ class STTHandler:
             return "Error connecting to speech service.", "en"
         except Exception as e:
             st.error(f"An unexpected error occurred during transcription: {e}")
-            return "An error occurred.", "en"
\ No newline at end of file
+            return "An error occurred.", "en"
+
+    def stream_transcribe(self, audio_bytes):
+        """
+        Transcribes audio a piece at a time, yielding (text so far, is_final, language).
+        The last item yielded has is_final set and holds the full transcript.
+        language is the detected language code, or None if the backend can't detect it.
+        """
+        if self.model is not None:
+            yield from self._stream_whisper(audio_bytes)
+        else:
+            yield from self._stream_google(audio_bytes)
+
+    def _stream_whisper(self, audio_bytes):
+        # Decode straight to a 16kHz float32 array, resampling if the recording used another rate
+        audio = decode_audio(io.BytesIO(audio_bytes), sampling_rate=SPEECH_SAMPLE_RATE)
+        segments, info = self.model.transcribe(audio, vad_filter=True, vad_parameters=VAD_PARAMETERS, language=None)
+        parts = []
+        # Segments are decoded lazily, so each one is yielded as soon as it's ready
+        for segment in segments:
+            parts.append(segment.text.strip())
+            yield " ".join(parts), False, info.language
+        yield " ".join(parts), True, info.language
+
+    def _stream_google(self, audio_bytes):
+        parts = []
+        for samples in self._speech_chunks(audio_bytes):
+            audio_data = sr.AudioData(samples.tobytes(), SPEECH_SAMPLE_RATE, 2)
+            try:
+                # Use Google's free web service for transcription.
+                parts.append(self.recognizer.recognize_google(audio_data))
+            except sr.UnknownValueError:
+                # Nothing recognisable in this chunk, move on to the next one
+                continue
+            yield " ".join(parts), False, None
+
+        yield " ".join(parts), True, None
+
+    def _speech_chunks(self, audio_bytes):
+        """
+        Yields 16kHz, 16-bit samples for each piece of the recording to send to Google.
+        Silence is dropped and pieces are only split at pauses, so no word is cut in half.
+        """
+        audio = decode_audio(io.BytesIO(audio_bytes), sampling_rate=SPEECH_SAMPLE_RATE)
+        # The VAD itself splits any stretch of speech longer than a chunk at its quietest point
+        vad_options = VadOptions(**VAD_PARAMETERS, max_speech_duration_s=STREAM_CHUNK_SECONDS)
+        chunk_size = STREAM_CHUNK_SECONDS * SPEECH_SAMPLE_RATE
+        segments, length = [], 0
+        for t in get_speech_timestamps(audio, vad_options):
+            if segments and length + t["end"] - t["start"] > chunk_size:
+                yield self._to_pcm(audio, segments)
+                segments, length = [], 0
+            segments.append(t)
+            length += t["end"] - t["start"]
+        if segments:
+            yield self._to_pcm(audio, segments)
+
+    @staticmethod
+    def _to_pcm(audio, segments):
+        """Joins the given speech segments of a float32 recording into 16-bit samples."""
+        speech = np.concatenate([audio[t["start"]:t["end"]] for t in segments])
+        return (np.clip(speech, -1, 1) * 32767).astype(np.int16)
@@ -1,23 +1,99 @@
 # components/tts.py
-import streamlit as st
+import os
 import io
+import wave
+import threading
+from collections import OrderedDict
+import streamlit as st
 from gtts import gTTS
 
+# Piper synthesizes speech locally with no network round-trip, but it is optional: gTTS is used without it.
+# To enable it, `pip install piper-tts==1.3.0` (the synthesize_wav API used below needs 1.3 or later),
+# download a voice such as en_US-lessac-medium.onnx with its .onnx.json config, and point PIPER_VOICE at it.
+try:
+    from piper import PiperVoice
+except ImportError:
+    PiperVoice = None
+
+# Piper voice model used for English; Piper has no Urdu voice, so Urdu always goes through gTTS
+PIPER_VOICE_PATH = os.getenv("PIPER_VOICE", "en_US-lessac-medium.onnx")
+
+# Recently synthesized audio, keyed by (text, language code), so repeated phrases are instant
+SPEECH_CACHE_SIZE = 256
+
 class TTSHandler:
     """Handles Text-to-Speech conversion."""
 
+    def __init__(self):
+        """Loads the local Piper voice if Piper and its model are available."""
+        self.voice = None
+        if PiperVoice is not None and os.path.exists(PIPER_VOICE_PATH):
+            try:
+                self.voice = PiperVoice.load(PIPER_VOICE_PATH)
+            except Exception as e:
+                # A corrupt voice file or a missing config shouldn't take the app down; gTTS still works
+                st.warning(f"Could not load the Piper voice, using Google text-to-speech instead. Error: {e}")
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
     def synthesize(self, text: str, language_code: str = "en"):
-        """Converts a text string into audio bytes."""
-        try:
-            # Map language codes to gTTS language names
-            lang_dict = {"en": "en", "ur": "ur"}
-            tts_lang = lang_dict.get(language_code, "en")
-            
-            tts = gTTS(text=text, lang=tts_lang, slow=False)
-            audio_fp = io.BytesIO()
-            tts.write_to_fp(audio_fp)
-            audio_fp.seek(0)
-            return audio_fp.read()
-        except Exception as e:
-            st.error(f"Error generating speech: {e}")
-            return None
\ No newline at end of file
+        """
+        Converts a text string into audio bytes.
+        Errors are raised rather than shown, since this often runs on a worker thread where st.error is dropped.
+        """
+        cache_key = (text, language_code)
+        with self._cache_lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key]
+
+        if self._uses_piper(language_code):
+            audio = self._synthesize_piper(text)
+        else:
+            audio = self._synthesize_gtts(text, language_code)
+
+        with self._cache_lock:
+            self._cache[cache_key] = audio
+            if len(self._cache) > SPEECH_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return audio
+
+    def mime_type(self, language_code: str = "en") -> str:
+        """Returns the format of the audio that synthesize produces for the language."""
+        return "audio/wav" if self._uses_piper(language_code) else "audio/mp3"
+
+    def join(self, audio_parts: list[bytes], language_code: str = "en") -> bytes:
+        """Joins audio clips produced by synthesize for the same language into a single clip."""
+        if not self._uses_piper(language_code):
+            # MP3 frames can simply be joined back to back
+            return b"".join(audio_parts)
+
+        # WAV clips each have their own header, so copy the frames into one new file
+        output = io.BytesIO()
+        with wave.open(output, "wb") as joined:
+            for i, part in enumerate(audio_parts):
+                with wave.open(io.BytesIO(part), "rb") as clip:
+                    if i == 0:
+                        joined.setparams(clip.getparams())
+                    joined.writeframes(clip.readframes(clip.getnframes()))
+        return output.getvalue()
+
+    def _uses_piper(self, language_code: str) -> bool:
+        return self.voice is not None and language_code == "en"
+
+    def _synthesize_piper(self, text: str) -> bytes:
+        wav_fp = io.BytesIO()
+        with wave.open(wav_fp, "wb") as wav_file:
+            # synthesize_wav sets the WAV header from the voice before writing the frames
+            self.voice.synthesize_wav(text, wav_file)
+        return wav_fp.getvalue()
+
+    def _synthesize_gtts(self, text: str, language_code: str) -> bytes:
+        # Map language codes to gTTS language names
+        lang_dict = {"en": "en", "ur": "ur"}
+        tts_lang = lang_dict.get(language_code, "en")
+
+        tts = gTTS(text=text, lang=tts_lang, slow=False)
+        audio_fp = io.BytesIO()
+        tts.write_to_fp(audio_fp)
+        return audio_fp.getvalue()
@@ -1,8 +1,15 @@
 # main.py
 import streamlit as st
 import os
+import re
+import pathlib
+import html
 import json
+import sqlite3
+import threading
 from datetime import datetime, timedelta
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
      
 # Import all components from our custom packages
@@ -14,18 +21,8 @@ from components.doc_generator import DocumentGenerator
 
 # --- Helper Functions ---
 
-def is_template(text: str) -> bool:
-    """Checks if the text looks like a template."""
-    return "[" in text and "]" in text or "{{" in text and "}}" in text
-
-def fill_template_from_dict(template_text: str, data_dict: dict) -> str:
-    """Fills a template using a dictionary of extracted data with flexible key matching."""
-    filled_text = template_text
-    
-    # Create a mapping of common field name variations
-    # In main.py, update the field_mappings dictionary:
-
-    field_mappings = {
+# Common variations of each field name, used to match extracted keys to template placeholders
+FIELD_MAPPINGS = {
     "Full Name": ["Name", "Full Name", "Employee Name", "Person Name"],
     "Name": ["Name", "Full Name", "Employee Name", "Person Name"],
     "Department": ["Department", "Dept", "Team", "Division"],
@@ -35,114 +32,226 @@ def fill_template_from_dict(template_text: str, data_dict: dict) -> str:
     "Manager Name": ["Manager Name", "Manager", "Supervisor", "Reporting To"],
     "Employee ID": ["Employee ID", "ID", "Employee Number", "Staff ID"],
     "Annual Salary": ["Annual Salary", "Salary", "Compensation", "Pay"]
-    }
-    
-    # For each key in the extracted data, try to find a matching placeholder
+}
+
+def _build_alias_map() -> dict:
+    """Maps every lowercased field name variation to its lowercased canonical field."""
+    alias_to_canonical = {}
+    for canonical, aliases in FIELD_MAPPINGS.items():
+        for alias in aliases:
+            # The first group an alias appears in wins, so "Name" and "Full Name" share one field
+            alias_to_canonical.setdefault(alias.lower(), canonical.lower())
+    return alias_to_canonical
+
+ALIAS_TO_CANONICAL = _build_alias_map()
+
+# Splits text after the punctuation that ends a sentence
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Finds the first short [Field] or {{Field}} placeholder, which is enough to call the text a template
+TEMPLATE_RE = re.compile(r"\[[^\]\n]{1,64}\]|\{\{[^}\n]{1,64}\}\}")
+
+# Matches [Field] and {{Field}} placeholders
+PLACEHOLDER_RE = re.compile(r"\[([^\[\]]+)\]|\{\{([^{}]+)\}\}")
+
+def canonical_field(name: str) -> str:
+    """Returns the canonical, lowercased field for a key or placeholder name."""
+    name = name.strip().lower()
+    return ALIAS_TO_CANONICAL.get(name, name)
+
+@st.cache_resource
+def get_handlers():
+    """Creates all components once and shares them across reruns."""
+    return STTHandler(), LLMClient(), TTSHandler(), DocumentProcessor(), DocumentGenerator()
+
+@st.cache_data
+def load_css() -> str:
+    """Reads the app's stylesheet once instead of on every rerun."""
+    return (pathlib.Path(__file__).parent / "styles.css").read_text(encoding="utf-8")
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Creates one shared thread pool for background work."""
+    return ThreadPoolExecutor(max_workers=4)
+
+def is_template(text: str) -> bool:
+    """Checks if the text looks like a template."""
+    return TEMPLATE_RE.search(text) is not None
+
+@st.cache_data(show_spinner=False)
+def generate_docx(content: str, title: str):
+    """Creates the downloadable DOCX, reusing the cached file when the same text is generated again."""
+    _, _, _, _, doc_generator = get_handlers()
+    return doc_generator.create_docx(content, title=title)
+
+@st.cache_data(show_spinner=False)
+def fill_template_from_dict(template_text: str, data_dict: dict) -> str:
+    """Fills a template using a dictionary of extracted data with flexible key matching."""
+    lookup = {canonical_field(key): str(value) for key, value in data_dict.items()}
+
+    # Scan the template once; the matches are reused below to build the output
+    matches = [(m, canonical_field(m.group(1) or m.group(2))) for m in PLACEHOLDER_RE.finditer(template_text)]
+
+    # The fields the template asks for, in order of first appearance
+    placeholders = dict.fromkeys(field for _, field in matches)
+
+    # Keys that don't match any placeholder fall back to partial matching, e.g. "Salary" fills "[Monthly Salary]"
     for key, value in data_dict.items():
-        # Try the exact key first
-        placeholder = f"[{key}]"
-        if placeholder in filled_text:
-            filled_text = filled_text.replace(placeholder, str(value))
+        field = canonical_field(key)
+        if field in placeholders:
             continue
-        
-        # If exact match doesn't work, try field mappings
-        matched = False
-        for standard_key, variations in field_mappings.items():
-            if key in variations:
-                for variation in variations:
-                    placeholder = f"[{variation}]"
-                    if placeholder in filled_text:
-                        filled_text = filled_text.replace(placeholder, str(value))
-                        matched = True
-                        break
-                if matched:
-                    break
-        
-        # If still not matched, try partial matching
-        if not matched:
-            for template_placeholder in [p.strip("[]") for p in template_text.split("[") if "]" in p]:
-                if key.lower() in template_placeholder.lower() or template_placeholder.lower() in key.lower():
-                    placeholder = f"[{template_placeholder}]"
-                    filled_text = filled_text.replace(placeholder, str(value))
-                    break
-    
-    return filled_text
+        names = (key.strip().lower(), field)
+        for placeholder in placeholders:
+            # Empty placeholders like a "[ ]" checkbox would match every key, since "" is in any string
+            if placeholder and placeholder not in lookup and any(name in placeholder or placeholder in name for name in names):
+                lookup[placeholder] = str(value)
+                break
+
+    # Stitch the text between placeholders together with their values, leaving unknown ones untouched
+    parts, last = [], 0
+    for m, field in matches:
+        parts.append(template_text[last:m.start()])
+        parts.append(lookup.get(field, m.group(0)))
+        last = m.end()
+    parts.append(template_text[last:])
+    return "".join(parts)
+
+def stream_answer_with_speech(llm_client, tts_handler, prompt: str, language_code: str, on_text):
+    """
+    Streams the AI's answer, starting speech synthesis for each sentence as soon as it is complete.
+    Calls on_text with the answer so far as it arrives, and returns the full answer
+    along with the speech futures, one per sentence, in order.
+    """
+    executor = get_executor()
+    audio_futures = []
+    response = ""
+    pending = ""
+    for chunk in llm_client.stream_response(prompt):
+        response += chunk
+        pending += chunk
+        on_text(response)
+        # Everything before the last sentence break is complete and can be spoken already
+        *sentences, pending = SENTENCE_END_RE.split(pending)
+        for sentence in sentences:
+            audio_futures.append(executor.submit(tts_handler.synthesize, sentence, language_code))
+    if pending.strip():
+        audio_futures.append(executor.submit(tts_handler.synthesize, pending, language_code))
+    return response, audio_futures
+
+# Requests allowed per day
+DAILY_REQUEST_LIMIT = 20
+
+def _default_state() -> dict:
+    """Returns fresh default values for everything kept in session state."""
+    return {
+        "history": [],
+        "document_text": "",
+        "extracted_info": None,
+        "filled_text": None,
+        "doc_buffer": None,
+        "processed_file_id": None,
+        "api_quota_exceeded": False,
+        "audio_error": None,
+    }
+
+def _ensure_state():
+    """Fills in any session state that isn't set yet."""
+    for key, value in _default_state().items():
+        st.session_state.setdefault(key, value)
+
+# The API quota belongs to the API key, so usage is counted per day across all sessions
+# and kept on disk so it survives restarts
+QUOTA_DB_PATH = os.getenv("QUOTA_DB", "quota.db")
+
+@st.cache_resource
+def get_quota_db() -> tuple[sqlite3.Connection, threading.Lock]:
+    """Opens the quota database once and shares the connection, and the lock that guards it, across sessions."""
+    # The lock lives here rather than at module level, since Streamlit re-runs this script on every interaction
+    conn = sqlite3.connect(QUOTA_DB_PATH, check_same_thread=False)
+    conn.execute("CREATE TABLE IF NOT EXISTS q(day TEXT PRIMARY KEY, n INT)")
+    return conn, threading.Lock()
+
+def _used_requests() -> int:
+    """Returns how many requests have been made today."""
+    conn, lock = get_quota_db()
+    with lock:
+        row = conn.execute("SELECT n FROM q WHERE day=?", (st.session_state["_today"].isoformat(),)).fetchone()
+    return row[0] if row else 0
+
+def _add_api_usage(delta: int) -> int:
+    """Adds delta to today's request count and returns the new count."""
+    conn, lock = get_quota_db()
+    day = st.session_state["_today"].isoformat()
+    with lock, conn:
+        conn.execute(
+            "INSERT INTO q(day, n) VALUES(?, ?) ON CONFLICT(day) DO UPDATE SET n = n + excluded.n",
+            (day, delta),
+        )
+        return conn.execute("SELECT n FROM q WHERE day=?", (day,)).fetchone()[0]
 
 def clear_session():
     """Clears the session state to start a new session."""
-    st.session_state.history = []
-    st.session_state.document_text = ""
-    st.session_state.extracted_info = None
-    st.session_state.filled_text = None
-    st.session_state.doc_buffer = None
-    # Reset API usage tracking
-    st.session_state.api_usage = {
-        "requests": 0,
-        "last_reset_date": datetime.now().date()
-    }
+    defaults = _default_state()
+    for key in ("history", "document_text", "extracted_info", "filled_text", "doc_buffer", "processed_file_id"):
+        st.session_state[key] = defaults[key]
     st.success("✅ Session cleared! You can now upload a new document.")
 
 def check_daily_quota():
     """Check if we've exceeded our daily quota."""
-    today = datetime.now().date()
-    
-    # Initialize API usage tracking if not present
-    if "api_usage" not in st.session_state:
-        st.session_state.api_usage = {
-            "requests": 0,
-            "last_reset_date": today
-        }
-    
-    # Reset counter if it's a new day
-    if st.session_state.api_usage["last_reset_date"] != today:
-        st.session_state.api_usage["requests"] = 0
-        st.session_state.api_usage["last_reset_date"] = today
-    
-    # Check if we've exceeded the daily limit (20 requests)
-    if st.session_state.api_usage["requests"] >= 20:
-        return False
-    
-    return True
+    return _used_requests() < DAILY_REQUEST_LIMIT
 
 def increment_api_usage():
     """Increment the API usage counter."""
-    if "api_usage" not in st.session_state:
-        st.session_state.api_usage = {
-            "requests": 0,
-            "last_reset_date": datetime.now().date()
-        }
-    
-    st.session_state.api_usage["requests"] += 1
-    print(f"API usage incremented to: {st.session_state.api_usage['requests']}")
+    requests = _add_api_usage(1)
+    print(f"API usage incremented to: {requests}")
 
 def get_remaining_quota():
     """Get information about remaining quota."""
-    today = datetime.now().date()
-    
-    # Initialize API usage tracking if not present
-    if "api_usage" not in st.session_state:
-        st.session_state.api_usage = {
-            "requests": 0,
-            "last_reset_date": today
-        }
-    
-    # Reset counter if it's a new day
-    if st.session_state.api_usage["last_reset_date"] != today:
-        st.session_state.api_usage["requests"] = 0
-        st.session_state.api_usage["last_reset_date"] = today
-    
+    used_requests = _used_requests()
     return {
-        "remaining_requests": 20 - st.session_state.api_usage["requests"],
-        "total_requests": 20,
-        "used_requests": st.session_state.api_usage["requests"]
+        "remaining_requests": DAILY_REQUEST_LIMIT - used_requests,
+        "total_requests": DAILY_REQUEST_LIMIT,
+        "used_requests": used_requests
     }
 
+@contextmanager
+def llm_guarded_call(description: str):
+    """
+    Wraps a call to the AI with the daily quota check and usage tracking.
+    Yields False if the quota is used up, otherwise counts the request and yields True,
+    rolling the count back if the call raises.
+    """
+    if not check_daily_quota():
+        st.session_state.api_quota_exceeded = True
+        with st.chat_message("assistant", avatar="🤖"):
+            st.error("❌ You have reached your daily API quota. Please wait until tomorrow or upgrade your plan.")
+            st.info("💡 To continue without waiting, consider upgrading your plan at [Google AI Studio](https://ai.google.dev/pricing).")
+        yield False
+        return
+
+    # Increment API usage BEFORE making the call
+    increment_api_usage()
+
+    try:
+        yield True
+    except Exception as e:
+        # Handle any unexpected errors
+        _add_api_usage(-1)  # Roll back the increment
+        st.error(f"❌ An unexpected error occurred: {str(e)}")
+        print(f"Unexpected error in {description}: {str(e)}")
+
+def show_quota_exhausted(message: str):
+    """Shows the API's quota error along with what the user can do about it."""
+    st.session_state.api_quota_exceeded = True
+    st.error("❌ " + message)
+    st.info("💡 To continue without waiting, consider upgrading your plan at [Google AI Studio](https://ai.google.dev/pricing).")
+    st.info("⏰ Alternatively, you can wait until your quota resets (typically daily) or try again later.")
+
 def reset_quota_for_testing():
     """Function to reset quota for testing purposes."""
-    st.session_state.api_usage = {
-        "requests": 0,
-        "last_reset_date": datetime.now().date()
-    }
+    conn, lock = get_quota_db()
+    with lock, conn:
+        conn.execute("DELETE FROM q WHERE day=?", (st.session_state["_today"].isoformat(),))
     st.success("API quota reset for testing!")
 
 # --- Main Application Logic ---
@@ -156,219 +265,15 @@ def main():
     )
     
     # Initialize session state - MOVED INSIDE MAIN FUNCTION
-    if 'history' not in st.session_state:
-        st.session_state.history = []
-    if 'document_text' not in st.session_state:
-        st.session_state.document_text = ""
-    if 'extracted_info' not in st.session_state:
-        st.session_state.extracted_info = None
-    if 'filled_text' not in st.session_state:
-        st.session_state.filled_text = None
-    if 'doc_buffer' not in st.session_state:
-        st.session_state.doc_buffer = None
-    if 'api_quota_exceeded' not in st.session_state:
-        st.session_state.api_quota_exceeded = False
-    if 'audio_error' not in st.session_state:
-        st.session_state.audio_error = None
+    # Look up today's date once per run; the quota helpers all read it from here
+    st.session_state["_today"] = datetime.now().date()
+    _ensure_state()
     
     # Enhanced CSS for better UI with fixed text visibility
-    st.markdown("""
-    <style>
-        /* Main app styling */
-        .stApp {
-            background: linear-gradient(to right, #f8f9fa, #e9ecef);
-        }
-        
-        /* Sidebar styling */
-        section[data-testid="stSidebar"] {
-            background: linear-gradient(135deg, #2E0854, #1e3c72);
-            color: white;
-            border-radius: 0 15px 15px 0;
-            box-shadow: 5px 0 15px rgba(0,0,0,0.1);
-        }
-        
-        /* Fix for all text in sidebar */
-        section[data-testid="stSidebar"] * {
-            color: white !important;
-        }
-        
-        /* Fix for input fields in sidebar */
-        section[data-testid="stSidebar"] input,
-        section[data-testid="stSidebar"] textarea,
-        section[data-testid="stSidebar"] select {
-            color: black !important;
-            background-color: white !important;
-            border-radius: 5px;
-            border: 1px solid #ddd;
-        }
-        
-        /* Fix for file uploader in sidebar */
-        section[data-testid="stSidebar"] div[data-testid="stFileUploader"] {
-            background-color: rgba(255, 255, 255, 0.9) !important;
-            border-radius: 10px;
-            padding: 10px;
-        }
-        
-        section[data-testid="stSidebar"] div[data-testid="stFileUploader"] label {
-            color: black !important;
-        }
-        
-        section[data-testid="stSidebar"] div[data-testid="stFileUploader"] span {
-            color: black !important;
-        }
-        
-        /* Fix for audio input in sidebar */
-        section[data-testid="stSidebar"] div[data-testid="stAudioInput"] {
-            background-color: rgba(255, 255, 255, 0.9) !important;
-            border-radius: 10px;
-            padding: 10px;
-        }
-        
-        section[data-testid="stSidebar"] div[data-testid="stAudioInput"] label {
-            color: black !important;
-        }
-        
-        section[data-testid="stSidebar"] div[data-testid="stAudioInput"] span {
-            color: black !important;
-        }
-        
-        /* Fix for expander in sidebar */
-        section[data-testid="stSidebar"] .streamlit-expanderHeader {
-            background-color: rgba(255, 255, 255, 0.9) !important;
-            color: black !important;
-        }
-        
-        section[data-testid="stSidebar"] .streamlit-expanderContent {
-            background-color: rgba(255, 255, 255, 0.9) !important;
-            color: black !important;
-        }
-        
-        /* Fix for buttons in sidebar */
-        section[data-testid="stSidebar"] button {
-            background-color: #4B9BFF !important; 
-            color: white !important; 
-            border: 1px solid #4B9BFF;
-            border-radius: 10px;
-            font-weight: 600;
-            transition: all 0.3s ease;
-        }
-        
-        section[data-testid="stSidebar"] button:hover {
-            background-color: #3a7bc8 !important;
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(0,0,0,0.2);
-        }
-        
-        /* Headers styling */
-        .stApp h1, .stApp h2, .stApp h3 {
-            color: #1e3c72; 
-            font-weight: 600;
-        }
-        
-        /* Card styling */
-        .card {
-            background-color: white;
-            border-radius: 15px;
-            padding: 20px;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            margin-bottom: 20px;
-            transition: all 0.3s ease;
-        }
-        
-        .card:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 10px 20px rgba(0,0,0,0.1);
-        }
-        
-        /* Chat message styling */
-        .stChatMessage {
-            border-radius: 15px;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-        }
-        
-        /* File uploader styling */
-        .stFileUploader {
-            border: 2px dashed #4B9BFF;
-            border-radius: 10px;
-            padding: 20px;
-            background-color: rgba(75, 155, 255, 0.05);
-        }
-        
-        /* Audio input styling */
-        .stAudioInput {
-            border-radius: 10px;
-            overflow: hidden;
-        }
-        
-        /* Download button styling - always visible */
-        .stDownloadButton {
-            background: linear-gradient(90deg, #4B9BFF, #3a7bc8) !important;
-            color: blue !important;
-            border-radius: 10px !important;
-            font-weight: 600 !important;
-            padding: 10px 20px !important;
-            transition: all 0.3s ease !important;
-            display: inline-block !important;
-            opacity: 1 !important;
-        }
-        
-        .stDownloadButton:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(0,0,0,0.2);
-        }
-        
-        /* Success/Warning/Error styling */
-        .stAlert {
-            border-radius: 10px;
-            margin-bottom: 20px;
-        }
-        
-        /* Expander styling */
-        .streamlit-expanderHeader {
-            background-color: #f8f9fa;
-            border-radius: 10px;
-            font-weight: 600;
-        }
-        
-        /* Code block styling */
-        .stCode {
-            background-color: #f8f9fa;
-            border-radius: 10px;
-            border-left: 4px solid #4B9BFF;
-        }
-        
-        /* Spinner styling */
-        .stSpinner {
-            color: #4B9BFF;
-        }
-        
-        /* Custom footer */
-        .footer {
-            text-align: center;
-            margin-top: 30px;
-            padding: 20px;
-            color: #6c757d;
-            font-size: 14px;
-        }
-        
-        /* Fix for audio input error display */
-        div[data-testid="stAudioInput"] div[role="alert"] {
-            display: none;
-        }
-        
-        /* Show error only when actually occurred */
-        .audio-error {
-            display: block !important;
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
     
     # Initialize all components
-    stt_handler = STTHandler()
-    llm_client = LLMClient()
-    tts_handler = TTSHandler()
-    doc_processor = DocumentProcessor()
-    doc_generator = DocumentGenerator()
+    stt_handler, llm_client, tts_handler, doc_processor, _ = get_handlers()
 
     # --- Main Header ---
     st.markdown("""
@@ -436,8 +341,11 @@ def main():
         )
         
         if uploaded_file:
-            with st.spinner("Processing document..."):
-                st.session_state.document_text = doc_processor.extract_text(uploaded_file)
+            # Only extract a newly uploaded file; later reruns reuse the text already in session state
+            if st.session_state.processed_file_id != uploaded_file.file_id:
+                with st.spinner("Processing document..."):
+                    st.session_state.document_text = doc_processor.extract_text(uploaded_file)
+                st.session_state.processed_file_id = uploaded_file.file_id
             st.success("✅ Document processed successfully!")
             
             if is_template(st.session_state.document_text):
@@ -475,7 +383,10 @@ def main():
                 audio_bytes = audio_input
 
             with st.spinner("Transcribing audio..."):
-                user_text, detected_lang = stt_handler.transcribe(audio_bytes)
+                # Show the transcript as it builds up, then clear it once the full text is ready
+                partial_placeholder = st.empty()
+                user_text, detected_lang = stt_handler.transcribe(audio_bytes, on_partial=partial_placeholder.caption)
+                partial_placeholder.empty()
             
             if "error" in user_text.lower():
                 st.session_state.audio_error = "Transcription failed. Please try again."
@@ -489,27 +400,23 @@ def main():
                 if is_template(st.session_state.document_text):
                     # --- ROBUST WORKFLOW WITH ERROR HANDLING ---
                     # Step 1: Extract information from user's speech
-                    if not check_daily_quota():
-                        st.session_state.api_quota_exceeded = True
-                        with st.chat_message("assistant", avatar="🤖"):
-                            st.error("❌ You have reached your daily API quota. Please wait until tomorrow or upgrade your plan.")
-                            st.info("💡 To continue without waiting, consider upgrading your plan at [Google AI Studio](https://ai.google.dev/pricing).")
-                        return
-                    
-                    # Increment API usage BEFORE making the call
-                    increment_api_usage()
-                    
-                    try:
+                    with llm_guarded_call("template processing") as ok:
+                        if not ok:
+                            return
+
+                        # Show the explicitly labelled fields, found without the AI, while the full extraction runs
+                        progress_placeholder = st.empty()
+                        quick_info = llm_client.quick_extract(user_text)
+                        if quick_info:
+                            progress_placeholder.json(quick_info)
                         extracted_info = llm_client.extract_info(user_text)
+                        progress_placeholder.empty()
                         
                         with st.chat_message("assistant", avatar="🤖"):
                             # --- CORRECTED LOGIC ---
                             # Check if the returned dictionary has an 'error' key
                             if extracted_info.get("error") == "RESOURCE_EXHAUSTED":
-                                st.session_state.api_quota_exceeded = True
-                                st.error("❌ " + extracted_info.get("message"))
-                                st.info("💡 To continue without waiting, consider upgrading your plan at [Google AI Studio](https://ai.google.dev/pricing).")
-                                st.info("⏰ Alternatively, you can wait until your quota resets (typically daily) or try again later.")
+                                show_quota_exhausted(extracted_info.get("message"))
                             elif extracted_info:
                                 # Store in session state for display in main area
                                 st.session_state.extracted_info = extracted_info
@@ -518,51 +425,44 @@ def main():
                                 
                                 # Generate the downloadable document
                                 with st.spinner("Generating document..."):
-                                    doc_buffer = doc_generator.create_docx(filled_text, title="Filled Document")
+                                    doc_buffer = generate_docx(filled_text, title="Filled Document")
                                 st.session_state.doc_buffer = doc_buffer
                                 
                                 st.success("✅ Document processed! Check the main content area for results.")
                             else:
                                 # This handles the case where no info could be extracted (empty dict)
                                 st.warning("⚠️ I couldn't extract any specific information to fill the template. Please try again, speaking more clearly.")
-                    except Exception as e:
-                        # Handle any unexpected errors
-                        st.session_state.api_usage["requests"] -= 1  # Roll back the increment
-                        st.error(f"❌ An unexpected error occurred: {str(e)}")
-                        print(f"Unexpected error in template processing: {str(e)}")
                 else:
                     # --- ORIGINAL WORKFLOW: ANSWER QUESTIONS ---
-                    if not check_daily_quota():
-                        st.session_state.api_quota_exceeded = True
-                        with st.chat_message("assistant", avatar="🤖"):
-                            st.error("❌ You have reached your daily API quota. Please wait until tomorrow or upgrade your plan.")
-                            st.info("💡 To continue without waiting, consider upgrading your plan at [Google AI Studio](https://ai.google.dev/pricing).")
-                        return
-                    
-                    # Increment API usage BEFORE making the call
-                    increment_api_usage()
-                    
-                    try:
-                        ai_response = llm_client.get_response(prompt=user_text, is_document_blank=st.session_state.document_text)
-                        
+                    with llm_guarded_call("question answering") as ok:
+                        if not ok:
+                            return
+
                         with st.chat_message("assistant", avatar="🤖"):
+                            response_placeholder = st.empty()
+                            ai_response, audio_futures = stream_answer_with_speech(
+                                llm_client, tts_handler, user_text, detected_lang, response_placeholder.write
+                            )
+
                             if "RESOURCE_EXHAUSTED" in ai_response or "quota" in ai_response.lower():
-                                st.session_state.api_quota_exceeded = True
-                                st.error("❌ " + ai_response)
-                                st.info("💡 To continue without waiting, consider upgrading your plan at [Google AI Studio](https://ai.google.dev/pricing).")
-                                st.info("⏰ Alternatively, you can wait until your quota resets (typically daily) or try again later.")
+                                for future in audio_futures:
+                                    future.cancel()
+                                response_placeholder.empty()
+                                show_quota_exhausted(ai_response)
                             else:
-                                st.write(ai_response)
-
                                 with st.spinner("Generating speech..."):
-                                    audio_output = tts_handler.synthesize(ai_response, language_code=detected_lang)
-                                    if audio_output:
-                                        st.audio(audio_output, format="audio/mp3")
-                    except Exception as e:
-                        # Handle any unexpected errors
-                        st.session_state.api_usage["requests"] -= 1  # Roll back the increment
-                        st.error(f"❌ An unexpected error occurred: {str(e)}")
-                        print(f"Unexpected error in question answering: {str(e)}")
+                                    # Most sentences were synthesized while the answer was still streaming.
+                                    # Errors from the worker threads are re-raised here, where st.error can show them.
+                                    try:
+                                        audio_parts = [future.result() for future in audio_futures]
+                                    except Exception as e:
+                                        st.error(f"Error generating speech: {e}")
+                                    else:
+                                        if audio_parts:
+                                            st.audio(
+                                                tts_handler.join(audio_parts, language_code=detected_lang),
+                                                format=tts_handler.mime_type(detected_lang),
+                                            )
 
     # Display a warning if API quota is exceeded
     if st.session_state.api_quota_exceeded:
@@ -632,9 +532,15 @@ def main():
         </div>
         """, unsafe_allow_html=True)
         
-        for message in st.session_state.history:
-            with st.chat_message(message["role"], avatar="👤" if message["role"] == "user" else "🤖"):
-                st.write(message["text"])
+        # Build the whole history as one block of HTML so it is sent to the browser in a single message
+        history_html = "".join(
+            f'<div class="msg {message["role"]}">'
+            f'<span class="msg-avatar">{"👤" if message["role"] == "user" else "🤖"}</span>'
+            f'<span class="msg-text">{html.escape(message["text"])}</span>'
+            f'</div>'
+            for message in st.session_state.history
+        )
+        st.markdown(history_html, unsafe_allow_html=True)
 
     # --- Footer ---
     st.markdown("""
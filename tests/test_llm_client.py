@@ -0,0 +1,106 @@
+# tests/test_llm_client.py
+import pytest
+from google.genai.errors import ClientError, ServerError
+from langchain_google_genai.chat_models import _handle_client_error, _handle_server_error
+from components.llm_client import EXTRACT_FIELDS, LLMClient, _extract_with_regex, _is_retryable_error
+
+LABELLED_FORM = """Full Name: Dr. Ahmed Raza
+Employee ID: EMP-1042
+Department: Machine Learning
+Company: Radiant Technologies
+Start Date: Jan. 5, 2024
+Job Title: Senior Engineer
+Manager Name: Sara Ali
+Annual Salary: $120,000"""
+
+@pytest.fixture
+def client():
+    """An LLMClient with no cache, built without an API key since these checks never call the AI."""
+    client = LLMClient.__new__(LLMClient)
+    client.cache = None
+    return client
+
+@pytest.mark.parametrize("user_input", [
+    "Company name is Acme",
+    "Department name is Machine Learning",
+    "The company name is Radiant Technologies. My name is Ali Khan.",
+    "My name is Dr. Ahmed Raza",
+    "My start date is Jan. 5, 2024",
+    "My salary is 5k per month",
+    "My job title is Senior Engineer at Google",
+])
+def test_free_text_is_left_to_the_model(user_input):
+    assert _extract_with_regex(user_input) == {}
+
+def test_labelled_values_keep_their_punctuation():
+    found = _extract_with_regex(LABELLED_FORM)
+    assert found["Full Name"] == "Dr. Ahmed Raza"
+    assert found["Start Date"] == "Jan. 5, 2024"
+    assert found["Annual Salary"] == "$120,000"
+
+def test_single_line_transcript_values_stop_at_the_next_label():
+    found = _extract_with_regex("Full name: Ali Khan. Employee ID: 1042. Department: Sales.")
+    assert found == {"Full Name": "Ali Khan", "Employee ID": "1042", "Department": "Sales"}
+
+def test_single_line_transcript_values_stop_at_the_end_of_the_sentence():
+    assert _extract_with_regex("Full name: Ali Khan. I work at Acme.") == {"Full Name": "Ali Khan"}
+
+def test_single_line_transcript_keeps_abbreviations():
+    found = _extract_with_regex("Full name: Dr. Ahmed Raza, start date: Jan. 5, 2024 and annual salary: $120,000.")
+    assert found == {"Full Name": "Dr. Ahmed Raza", "Start Date": "Jan. 5, 2024", "Annual Salary": "$120,000"}
+
+def test_label_inside_a_longer_label_is_ignored():
+    assert _extract_with_regex("Company name: Acme. Department name: ML") == {"Company": "Acme"}
+
+def test_fully_labelled_transcript_skips_the_model(client):
+    transcript = " ".join(line + "." for line in LABELLED_FORM.splitlines())
+    result, _, _, prompt = client._prepare_extraction(transcript)
+    assert prompt is None
+    assert result["Full Name"] == "Dr. Ahmed Raza"
+    assert result["Annual Salary"] == "$120,000"
+
+def test_unparseable_reply_does_not_fall_back_to_regex(client):
+    assert client._parse_extraction("Sorry, I can't help with that.", found={"Full Name": "Ali Khan"}) == {}
+
+def test_monthly_salary_label_is_not_annual():
+    assert "Annual Salary" not in _extract_with_regex("Salary: 5000")
+
+def test_fully_labelled_form_skips_the_model(client):
+    result, _, _, prompt = client._prepare_extraction(LABELLED_FORM)
+    assert prompt is None
+    assert set(result) == set(EXTRACT_FIELDS)
+
+def test_partly_labelled_input_asks_the_model_for_every_field(client):
+    result, _, found, prompt = client._prepare_extraction("Employee ID: EMP-1042\nI work at Acme as a manager.")
+    assert result is None
+    assert found == {"Employee ID": "EMP-1042"}
+    assert all(f"- {field}:" in prompt for field in EXTRACT_FIELDS)
+
+def test_model_values_win_over_regex(client):
+    found = {"Full Name": "Acme", "Employee ID": "EMP-1042"}
+    extracted = client._parse_extraction('{"Full Name": "Ali Khan", "Company": "Acme"}', found=found)
+    assert extracted == {"Full Name": "Ali Khan", "Company": "Acme", "Employee ID": "EMP-1042"}
+
+def _api_error(code: int, message: str) -> Exception:
+    """Builds the error the library raises for an API response with the given status code."""
+    body = {"error": {"code": code, "message": message, "status": "ERROR"}}
+    try:
+        if code >= 500:
+            _handle_server_error(ServerError(code, body))
+        else:
+            _handle_client_error(ClientError(code, body), {"model": "test"})
+    except Exception as e:
+        return e
+
+@pytest.mark.parametrize("code, message, retryable", [
+    (400, "Invalid request", False),
+    (401, "API key not valid", False),
+    (403, "Permission denied", False),
+    (404, "Model not found", False),
+    (429, "Quota exceeded, quotaId: GenerateRequestsPerMinutePerProjectPerModel-FreeTier", True),
+    (429, "Quota exceeded, quotaId: GenerateRequestsPerDayPerProjectPerModel-FreeTier", False),
+    (500, "Internal error", True),
+    (503, "The model is overloaded", True),
+])
+def test_only_transient_errors_are_retried(code, message, retryable):
+    assert _is_retryable_error(_api_error(code, message)) is retryable
@@ -0,0 +1,18 @@
+# tests/test_main.py
+from main import fill_template_from_dict
+
+def test_placeholders_are_filled_by_alias():
+    template = "Name: [Name]\nCompany: {{Organization}}"
+    filled = fill_template_from_dict(template, {"Full Name": "Ali", "Company": "Acme"})
+    assert filled == "Name: Ali\nCompany: Acme"
+
+def test_unknown_placeholders_are_left_alone():
+    assert fill_template_from_dict("Badge: [Badge Number]", {"Full Name": "Ali"}) == "Badge: [Badge Number]"
+
+def test_partial_match_fills_a_longer_placeholder():
+    assert fill_template_from_dict("Pay: [Monthly Salary]", {"Salary": "5000"}) == "Pay: 5000"
+
+def test_empty_checkbox_placeholders_are_left_alone():
+    template = "[ ] I agree to the terms\nName: [Name]"
+    filled = fill_template_from_dict(template, {"Full Name": "Ali", "Company": "Acme"})
+    assert filled == "[ ] I agree to the terms\nName: Ali"